@@ -0,0 +1,17 @@
+"""
+Decoradores de Numba con respaldo en Python puro.
+
+Los kernels numéricos del proyecto importan `njit` y `prange` desde aquí. Si
+Numba no está instalado, los decoradores dejan las funciones intactas y
+`prange` es `range`: los resultados son los mismos, pero sin compilar.
+"""
+try:
+    from numba import njit, prange
+except ImportError:
+    prange = range
+
+    def njit(*args, **kwargs):
+        # Admite tanto `@njit` como `@njit(cache=True, ...)`.
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda function: function
@@ -0,0 +1,290 @@
+import numpy as np
+from _njit import njit, prange
+
+# Codificación del tipo de posición dentro del núcleo compilado.
+LONG = 0
+SHORT = 1
+
+# Columnas de `trade_data` (datos de punto flotante de cada operación).
+PRICE, SHARES, STOP_LOSS, TAKE_PROFIT, PNL = 0, 1, 2, 3, 4
+
+
+@njit(cache=True, nogil=True, boundscheck=False)
+def find_exit(close, start, position_type, stop_loss_price, take_profit_price):
+    """
+    Busca la vela de cierre de una posición recorriendo los precios hacia adelante.
+
+    Args:
+        close (np.ndarray): Precios de cierre.
+        start (int): Primera vela en la que se evalúan el SL/TP de la posición.
+        position_type (int): `LONG` o `SHORT`.
+        stop_loss_price (float): Precio de stop-loss de la posición.
+        take_profit_price (float): Precio de take-profit de la posición.
+
+    Returns:
+        int: Índice de la primera vela que alcanza el SL o el TP, o `len(close)`
+             si la posición nunca se cierra dentro de los datos.
+    """
+    n_bars = close.shape[0]
+    if position_type == LONG:
+        for j in range(start, n_bars):
+            if close[j] >= take_profit_price or close[j] <= stop_loss_price:
+                return j
+    else:
+        for j in range(start, n_bars):
+            if close[j] <= take_profit_price or close[j] >= stop_loss_price:
+                return j
+    return n_bars
+
+
+@njit(cache=True, nogil=True, fastmath=True, boundscheck=False)
+def simulate(close, buys, sells, initial_cash, commission, pct_cash,
+             stop_loss, take_profit, max_short_pct, last_price):
+    """
+    Núcleo numérico del backtest, compilado con Numba.
+
+    Reproduce vela a vela la lógica de `run_backtest`, manteniendo las operaciones
+    en arreglos de NumPy preasignados (Struct-of-Arrays), indexados por el número
+    de operación en orden de apertura.
+
+    La vela de cierre por SL/TP de cada posición se calcula al abrirla con
+    `find_exit` y la operación se encola en la lista de cierres de esa vela, de
+    modo que cerrar una posición cuesta O(1) (se retira de `active_ids`
+    intercambiándola con la última). La exposición agregada (acciones LONG y
+    SHORT y nocional de apertura de los SHORT) se mantiene como totales que se
+    actualizan en cada apertura y cierre, así que el valor del portafolio en
+    cada vela es `cash + (long_shares - short_shares) * precio + 2 * short_notional`.
+
+    Args:
+        close (np.ndarray): Precios de cierre (float32 o float64; el efectivo, el
+                            valor del portafolio y los datos de las operaciones
+                            se calculan siempre en float64).
+        buys (np.ndarray): Señales de compra (bool).
+        sells (np.ndarray): Señales de venta (bool).
+        initial_cash (float): Capital inicial.
+        commission (float): Costo de comisión por operación.
+        pct_cash (float): Fracción del efectivo usada en cada nueva posición.
+        stop_loss (float): Porcentaje de stop-loss.
+        take_profit (float): Porcentaje de take-profit.
+        max_short_pct (float): Proporción máxima de posiciones SHORT abiertas.
+        last_price (float): Precio usado para liquidar las posiciones abiertas al final.
+
+    Returns:
+        tuple: Una tupla conteniendo:
+            - cash (float): El efectivo final después de la liquidación.
+            - values (np.ndarray): Valor del portafolio, con `n_bars + 1` registros:
+              el capital inicial, el valor al cierre de cada vela y, en el último,
+              el efectivo tras la liquidación final.
+            - trade_type (np.ndarray): Tipo de cada operación (`LONG` o `SHORT`).
+            - trade_bar (np.ndarray): Vela de apertura de cada operación.
+            - trade_data (np.ndarray): Matriz (n_operaciones, 5) con precio de
+              apertura, acciones, stop-loss, take-profit y PnL.
+            - closed_ids (np.ndarray): Operaciones cerradas, en orden de cierre.
+            - active_ids (np.ndarray): Operaciones que quedaron abiertas, en orden de apertura.
+    """
+    n_bars = close.shape[0]
+    values = np.empty(n_bars + 1, dtype=np.float64)
+    values[0] = initial_cash
+
+    # Como máximo se abre una posición por vela.
+    trade_type = np.empty(n_bars, dtype=np.int8)
+    trade_bar = np.empty(n_bars, dtype=np.int64)
+    trade_data = np.zeros((n_bars, 5), dtype=np.float64)
+    closed_ids = np.empty(n_bars, dtype=np.int64)
+    active_ids = np.empty(n_bars, dtype=np.int64)
+    active_slot = np.empty(n_bars, dtype=np.int64)  # posición de cada operación en `active_ids`
+
+    # Operaciones pendientes de cierre agrupadas por vela de salida, como listas
+    # enlazadas en orden de apertura (el mismo orden en que se cerraban antes).
+    exit_head = np.full(n_bars, -1, dtype=np.int64)
+    exit_tail = np.full(n_bars, -1, dtype=np.int64)
+    exit_next = np.full(n_bars, -1, dtype=np.int64)
+
+    n_trades = 0
+    n_closed = 0
+    n_active = 0
+    n_longs = 0
+    n_shorts = 0
+    cash = initial_cash
+    long_shares = 0.0
+    short_shares = 0.0
+    short_notional = 0.0
+
+    for i in range(n_bars):
+        current_price = close[i]
+        has_signal = buys[i] or sells[i]
+
+        # Vela sin eventos: las posiciones abiertas no cambian.
+        if not has_signal and exit_head[i] == -1:
+            current_equity = cash + long_shares * current_price
+            if current_equity <= 0:
+                values[i + 1] = current_equity
+            else:
+                values[i + 1] = cash + (long_shares - short_shares) * current_price + 2 * short_notional
+            continue
+
+        # --- Cierre de las posiciones cuyo SL/TP se alcanza en esta vela ---
+        if exit_head[i] != -1:
+            t = exit_head[i]
+            while t != -1:
+                open_price = trade_data[t, PRICE]
+                n_shares = trade_data[t, SHARES]
+                if trade_type[t] == LONG:
+                    cash += current_price * n_shares * (1 - commission)
+                    trade_data[t, PNL] = (current_price - open_price) * n_shares
+                    n_longs -= 1
+                    long_shares -= n_shares
+                else:
+                    pnl = (open_price - current_price) * n_shares * (1 - commission)
+                    initial_margin = open_price * n_shares * (1 + commission)
+                    cash += pnl + initial_margin
+                    trade_data[t, PNL] = pnl
+                    n_shorts -= 1
+                    short_shares -= n_shares
+                    short_notional -= open_price * n_shares
+                closed_ids[n_closed] = t
+                n_closed += 1
+
+                # Swap-pop: la última posición activa ocupa el lugar de la cerrada.
+                last = active_ids[n_active - 1]
+                active_ids[active_slot[t]] = last
+                active_slot[last] = active_slot[t]
+                n_active -= 1
+                t = exit_next[t]
+
+            # Sin posiciones de un lado, su total vuelve a cero exacto (sin residuos de redondeo).
+            if n_longs == 0:
+                long_shares = 0.0
+            if n_shorts == 0:
+                short_shares = 0.0
+                short_notional = 0.0
+
+        # --- Chequeo de salud del portafolio ---
+        current_equity = cash + long_shares * current_price
+        if current_equity <= 0:
+            values[i + 1] = current_equity
+            continue
+
+        # --- Apertura de nuevas posiciones ---
+        n_shares = (cash * pct_cash) / current_price
+        if has_signal and n_shares > 0:
+            cost_of_long = current_price * n_shares * (1 + commission)
+            opened = -1
+            if buys[i] and cash >= cost_of_long:
+                cash -= cost_of_long
+                opened = LONG
+            elif sells[i]:
+                position_margin = current_price * n_shares * (1 + commission)
+                if (n_shorts + 1) / (n_longs + n_shorts + 1) <= max_short_pct and cash >= position_margin:
+                    cash -= position_margin
+                    opened = SHORT
+
+            if opened != -1:
+                t = n_trades
+                n_trades += 1
+                trade_type[t] = opened
+                trade_bar[t] = i
+                trade_data[t, PRICE] = current_price
+                trade_data[t, SHARES] = n_shares
+                if opened == LONG:
+                    trade_data[t, STOP_LOSS] = current_price * (1 - stop_loss)
+                    trade_data[t, TAKE_PROFIT] = current_price * (1 + take_profit)
+                    n_longs += 1
+                    long_shares += n_shares
+                else:
+                    trade_data[t, STOP_LOSS] = current_price * (1 + stop_loss)
+                    trade_data[t, TAKE_PROFIT] = current_price * (1 - take_profit)
+                    n_shorts += 1
+                    short_shares += n_shares
+                    short_notional += current_price * n_shares
+                exit_bar = find_exit(close, i + 1, opened, trade_data[t, STOP_LOSS],
+                                     trade_data[t, TAKE_PROFIT])
+                if exit_bar < n_bars:
+                    if exit_head[exit_bar] == -1:
+                        exit_head[exit_bar] = t
+                    else:
+                        exit_next[exit_tail[exit_bar]] = t
+                    exit_tail[exit_bar] = t
+                active_slot[t] = n_active
+                active_ids[n_active] = t
+                n_active += 1
+
+        # --- Valor del portafolio al cierre de la vela ---
+        values[i + 1] = cash + (long_shares - short_shares) * current_price + 2 * short_notional
+
+    # --- Liquidación final de posiciones abiertas ---
+    # Los identificadores crecen con la apertura: ordenarlos restaura ese orden.
+    active_ids = np.sort(active_ids[:n_active])
+    for k in range(n_active):
+        t = active_ids[k]
+        open_price = trade_data[t, PRICE]
+        n_shares = trade_data[t, SHARES]
+        if trade_type[t] == LONG:
+            cash += last_price * n_shares * (1 - commission)
+        else:
+            pnl = (open_price - last_price) * n_shares * (1 - commission)
+            initial_margin = open_price * n_shares * (1 + commission)
+            cash += pnl + initial_margin
+    values[n_bars] = cash
+
+    return (cash, values, trade_type[:n_trades], trade_bar[:n_trades], trade_data[:n_trades],
+            closed_ids[:n_closed], active_ids)
+
+
+@njit(cache=True, nogil=True)
+def simulate_split(close, buys, sells, initial_cash, commission, pct_cash,
+                   stop_loss, take_profit, max_short_pct, last_price):
+    """
+    Ejecuta `simulate` sobre una sola división y devuelve solo lo que necesita
+    la optimización. Sin `parallel=True`: no arranca los hilos de Numba, así
+    que sirve a los procesos que ya reparten las pruebas entre los núcleos.
+
+    Returns:
+        tuple: Los valores del portafolio (con el capital inicial) y el número
+               de operaciones cerradas.
+    """
+    result = simulate(close, buys, sells, initial_cash, commission, pct_cash,
+                      stop_loss, take_profit, max_short_pct, last_price)
+    return result[1], result[5].shape[0]
+
+
+@njit(cache=True, nogil=True, parallel=True)
+def simulate_splits(close, buys, sells, offsets, initial_cash, commission, pct_cash,
+                    stop_loss, take_profit, max_short_pct, last_prices):
+    """
+    Ejecuta `simulate` sobre varias divisiones en paralelo (una por hilo).
+
+    Los datos de las divisiones llegan concatenados: la división `k` ocupa las
+    posiciones `offsets[k]:offsets[k + 1]` de `close`, `buys` y `sells`.
+
+    Args:
+        close (np.ndarray): Precios de cierre concatenados (float32 o float64).
+        buys (np.ndarray): Señales de compra concatenadas (bool).
+        sells (np.ndarray): Señales de venta concatenadas (bool).
+        offsets (np.ndarray): Inicio de cada división, más el total al final (int64).
+        initial_cash (float): Capital inicial de cada división.
+        commission (float): Costo de comisión por operación.
+        pct_cash (float): Fracción del efectivo usada en cada nueva posición.
+        stop_loss (float): Porcentaje de stop-loss.
+        take_profit (float): Porcentaje de take-profit.
+        max_short_pct (float): Proporción máxima de posiciones SHORT abiertas.
+        last_prices (np.ndarray): Precio de liquidación final de cada división.
+
+    Returns:
+        tuple: Una tupla conteniendo:
+            - values (np.ndarray): Valores del portafolio concatenados; los de la
+              división `k` (con su capital inicial) están en
+              `offsets[k] + k:offsets[k + 1] + k + 1`.
+            - n_closed (np.ndarray): Número de operaciones cerradas de cada división.
+    """
+    n_splits = offsets.shape[0] - 1
+    values = np.empty(offsets[n_splits] + n_splits, dtype=np.float64)
+    n_closed = np.empty(n_splits, dtype=np.int64)
+    for k in prange(n_splits):
+        start = offsets[k]
+        end = offsets[k + 1]
+        result = simulate(close[start:end], buys[start:end], sells[start:end], initial_cash,
+                          commission, pct_cash, stop_loss, take_profit, max_short_pct, last_prices[k])
+        values[start + k:end + k + 1] = result[1]
+        n_closed[k] = result[5].shape[0]
+    return values, n_closed
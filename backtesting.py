@@ -1,6 +1,8 @@
+import numpy as np
 import pandas as pd
-from config import Operation
+from config import TRADE_DTYPE
 from get_signals import calculate_indicators, generate_signals
+from backtest_core import simulate, simulate_split, simulate_splits, LONG, PRICE, SHARES, STOP_LOSS, TAKE_PROFIT, PNL
 
 
 def run_backtest(df: pd.DataFrame, initial_cash: float, commission: float, params: dict):
@@ -19,105 +21,106 @@ def run_backtest(df: pd.DataFrame, initial_cash: float, commission: float, param
         tuple: Una tupla conteniendo:
             - cash (float): El efectivo final después de la simulación.
             - portfolio_df (pd.Series): La serie temporal del valor del portafolio.
-            - closed_trades_log (list): Una lista de objetos `Operation` cerrados.
-            - active_positions (list): Una lista de objetos `Operation` que quedaron abiertos.
+            - closed_trades_log (np.recarray): Las operaciones cerradas (`TRADE_DTYPE`).
+            - active_positions (np.recarray): Las operaciones que quedaron abiertas (`TRADE_DTYPE`).
     """
-    # --- 1. Inicialización de variables ---
-    cash = initial_cash
-    active_positions: list[Operation] = []
-    closed_trades_log: list[Operation] = []
-    portfolio_history = [{'timestamp': df.index[0], 'value': initial_cash}]
-
-    # --- 2. Pre-cálculo de señales para eficiencia ---
+    # --- 1. Pre-cálculo de señales para eficiencia ---
     df_with_signals = generate_signals(calculate_indicators(df, params), params)
-    pct_cash = params['pct_cash']
-
-    # --- 3. Bucle principal de simulación ---
-    for timestamp, row in df_with_signals.iterrows():
-        current_price = row['Close']
-
-        # --- 3.1. Cierre de Posiciones Abiertas ---
-        # Se itera sobre una copia para poder modificar la lista original.
-        for position in active_positions[:]:
-
-            # --- Cierre de posiciones LONG por SL/TP ---
-            if position.type == 'LONG' and (
-                    current_price >= position.take_profit or current_price <= position.stop_loss):
-                cash += current_price * position.n_shares * (1 - commission)
-                position.status = 'CLOSED'
-                position.pnl = (current_price - position.open_price) * position.n_shares
-                closed_trades_log.append(position)
-                active_positions.remove(position)
-
-            # --- Cierre de posiciones SHORT por SL/TP ---
-            elif position.type == 'SHORT' and (
-                    current_price <= position.take_profit or current_price >= position.stop_loss):
-                pnl = (position.open_price - current_price) * position.n_shares * (1 - commission)
-                initial_margin = position.open_price * position.n_shares * (1 + commission)
-                cash += pnl + initial_margin
-                position.status = 'CLOSED'
-                position.pnl = pnl
-                closed_trades_log.append(position)
-                active_positions.remove(position)
-
-        # --- 3.2. Chequeo de Salud del Portafolio ---
-        long_value = sum(p.n_shares * current_price for p in active_positions if p.type == 'LONG')
-        current_equity = cash + long_value
-        if current_equity <= 0:
-            portfolio_history.append({'timestamp': timestamp, 'value': current_equity})
-            continue
-
-        # --- 3.3. Apertura de Nuevas Posiciones ---
-        n_shares = (cash * pct_cash) / current_price
-        if n_shares > 0:
-
-            # --- Apertura de posición LONG ---
-            cost_of_long = current_price * n_shares * (1 + commission)
-            if row['buy_signal'] and cash >= cost_of_long:
-                cash -= cost_of_long
-                active_positions.append(Operation(
-                    open_time=timestamp, open_price=current_price, n_shares=n_shares, type='LONG',
-                    stop_loss=current_price * (1 - params['stop_loss']),
-                    take_profit=current_price * (1 + params['take_profit'])
-                ))
-
-            # --- Apertura de posición SHORT ---
-            elif row['sell_signal']:
-                n_longs = sum(1 for p in active_positions if p.type == 'LONG')
-                n_shorts = sum(1 for p in active_positions if p.type == 'SHORT')
-                position_margin = current_price * n_shares * (1 + commission)
-
-                if (n_shorts + 1) / (n_longs + n_shorts + 1) <= params['max_short_pct'] and cash >= position_margin:
-                    cash -= position_margin
-                    active_positions.append(Operation(
-                        open_time=timestamp, open_price=current_price, n_shares=n_shares, type='SHORT',
-                        stop_loss=current_price * (1 + params['stop_loss']),
-                        take_profit=current_price * (1 - params['take_profit'])
-                    ))
-
-        # --- 3.4. Cálculo del Valor del Portafolio para el Histórico ---
-        final_long_value = sum(p.n_shares * current_price for p in active_positions if p.type == 'LONG')
-        short_equity = sum(
-            (pos.open_price * pos.n_shares) + ((pos.open_price - current_price) * pos.n_shares)
-            for pos in active_positions if pos.type == 'SHORT'
-        )
-        portfolio_value = cash + final_long_value + short_equity
-        portfolio_history.append({'timestamp': timestamp, 'value': portfolio_value})
-
-    # --- 4. Liquidación Final de Posiciones Abiertas ---
-    last_price = df['Close'].iloc[-1]
-    for pos in active_positions[:]:
-        if pos.type == 'LONG':
-            cash += last_price * pos.n_shares * (1 - commission)
-        elif pos.type == 'SHORT':
-            pnl = (pos.open_price - last_price) * pos.n_shares * (1 - commission)
-            initial_margin = pos.open_price * pos.n_shares * (1 + commission)
-            cash += pnl + initial_margin
-
-    if portfolio_history:
-        portfolio_history[-1]['value'] = cash
-
-    # --- 5. Retorno de Resultados ---
-    portfolio_df = pd.DataFrame(portfolio_history).set_index('timestamp')['value']
+    # Los precios se pasan en su tipo original (float32 o float64): el núcleo
+    # acumula el efectivo y el valor del portafolio siempre en float64.
+    close = df_with_signals['Close'].to_numpy()
+    buys = df_with_signals['buy_signal'].to_numpy(dtype=np.bool_)
+    sells = df_with_signals['sell_signal'].to_numpy(dtype=np.bool_)
+    timestamps = df_with_signals.index
+
+    # --- 2. Simulación vela a vela (núcleo compilado con Numba) ---
+    cash, values, trade_type, trade_bar, trade_data, closed_ids, active_ids = simulate(
+        close, buys, sells, float(initial_cash), float(commission), float(params['pct_cash']),
+        float(params['stop_loss']), float(params['take_profit']), float(params['max_short_pct']),
+        float(df['Close'].iloc[-1])
+    )
+
+    # --- 3. Registro de las operaciones como arreglo estructurado ---
+    open_times = timestamps.to_numpy()
+
+    def build_trades(ids: np.ndarray, status: str) -> np.recarray:
+        trades = np.recarray(len(ids), dtype=TRADE_DTYPE)
+        trades['open_time'] = open_times[trade_bar[ids]]
+        trades['open_price'] = trade_data[ids, PRICE]
+        trades['n_shares'] = trade_data[ids, SHARES]
+        trades['type'] = np.where(trade_type[ids] == LONG, 'LONG', 'SHORT')
+        trades['stop_loss'] = trade_data[ids, STOP_LOSS]
+        trades['take_profit'] = trade_data[ids, TAKE_PROFIT]
+        trades['status'] = status
+        trades['pnl'] = trade_data[ids, PNL]
+        return trades
+
+    closed_trades_log = build_trades(closed_ids, 'CLOSED')
+    active_positions = build_trades(active_ids, 'OPEN')
+
+    # --- 4. Retorno de Resultados ---
+    # `values` ya incluye el capital inicial, fechado con la primera vela de `df`.
+    portfolio_df = pd.Series(
+        values, index=pd.DatetimeIndex(df.index[:1].append(timestamps), name='timestamp'),
+        name='value', copy=False
+    )
     return cash, portfolio_df, closed_trades_log, active_positions
 
+
+def run_backtest_splits(split_dfs: list[pd.DataFrame], initial_cash: float, commission: float,
+                        params: dict, split_signals: list[pd.DataFrame], parallel: bool = True):
+    """
+    Ejecuta el backtest de varias divisiones a la vez, repartiéndolas entre los
+    hilos de Numba. Cada división se simula igual que con `run_backtest`.
+
+    Args:
+        split_dfs (list[pd.DataFrame]): Datos históricos de cada división.
+        initial_cash (float): Capital inicial de cada división.
+        commission (float): Costo de comisión por operación.
+        params (dict): Diccionario completo con los hiperparámetros de la estrategia.
+        split_signals (list[pd.DataFrame]): Señales ya calculadas para las velas
+                     de cada división.
+        parallel (bool): Si es `False`, las divisiones se simulan una tras otra en
+                     el hilo actual, sin arrancar los hilos de Numba (para los
+                     procesos que ya ocupan un núcleo cada uno).
+
+    Returns:
+        list[tuple]: Por cada división, la serie temporal del valor del portafolio
+                     y el número de operaciones cerradas.
+    """
+    strategy = (float(initial_cash), float(commission), float(params['pct_cash']), float(params['stop_loss']),
+                float(params['take_profit']), float(params['max_short_pct']))
+
+    if not parallel:
+        results = []
+        for df, signals in zip(split_dfs, split_signals):
+            values, n_closed = simulate_split(
+                signals['Close'].to_numpy(), signals['buy_signal'].to_numpy(dtype=np.bool_),
+                signals['sell_signal'].to_numpy(dtype=np.bool_), *strategy, float(df['Close'].iloc[-1])
+            )
+            portfolio_df = pd.Series(
+                values, index=pd.DatetimeIndex(df.index[:1].append(signals.index), name='timestamp'),
+                name='value', copy=False
+            )
+            results.append((portfolio_df, int(n_closed)))
+        return results
+
+    sizes = np.array([len(signals) for signals in split_signals], dtype=np.int64)
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    close = np.concatenate([s['Close'].to_numpy() for s in split_signals])
+    buys = np.concatenate([s['buy_signal'].to_numpy(dtype=np.bool_) for s in split_signals])
+    sells = np.concatenate([s['sell_signal'].to_numpy(dtype=np.bool_) for s in split_signals])
+    last_prices = np.array([df['Close'].iloc[-1] for df in split_dfs], dtype=np.float64)
+
+    values, n_closed = simulate_splits(close, buys, sells, offsets, *strategy, last_prices)
+
+    results = []
+    for k, (df, signals) in enumerate(zip(split_dfs, split_signals)):
+        portfolio_df = pd.Series(
+            values[offsets[k] + k:offsets[k + 1] + k + 1],
+            index=pd.DatetimeIndex(df.index[:1].append(signals.index), name='timestamp'),
+            name='value', copy=False
+        )
+        results.append((portfolio_df, int(n_closed[k])))
+    return results
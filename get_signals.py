@@ -1,11 +1,78 @@
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-import ta
+from indicators_nb import rsi_wilder, bbands, stoch_k, macd, signals_from_indicators
 
+# Precios (high, low, close) de cada set de datos visto, indexados por un hash de
+# su contenido: la optimización vuelve a usar los mismos datos en cada prueba, y
+# dos sets distintos nunca comparten indicadores aunque coincidan sus fechas.
+# Los indicadores se calculan en float32: la estrategia no es sensible a esa
+# precisión y se reduce a la mitad la memoria que recorren los kernels.
+# El registro guarda solo los `_MAX_PRICE_SETS` sets usados más recientemente
+# (LRU): al recorrer muchas ventanas distintas la memoria no crece sin límite.
+_MAX_PRICE_SETS = 8
+_PRICES: OrderedDict[tuple, tuple[np.ndarray, np.ndarray, np.ndarray]] = OrderedDict()
 
-def calculate_indicators(df: pd.DataFrame, params: dict) -> pd.DataFrame:
+
+def _register_prices(df: pd.DataFrame) -> tuple:
+    """
+    Registra los precios de `df` y retorna la clave con la que se cachean sus indicadores.
+    """
+    prices = tuple(df[column].to_numpy(dtype=np.float32) for column in ('High', 'Low', 'Close'))
+    digest = hashlib.blake2b(digest_size=16)
+    for array in prices:
+        digest.update(np.ascontiguousarray(array).data)
+    key = (len(df), digest.hexdigest())
+    # Los cachés de indicadores solo leen `_PRICES[key]` justo después de este
+    # registro, así que descartar un set antiguo nunca deja una clave sin precios.
+    if key in _PRICES:
+        _PRICES.move_to_end(key)
+    else:
+        _PRICES[key] = prices
+        if len(_PRICES) > _MAX_PRICE_SETS:
+            _PRICES.popitem(last=False)
+    return key
+
+
+def _read_only(*arrays: np.ndarray):
+    # Los arreglos cacheados se comparten entre pruebas: no deben modificarse.
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays if len(arrays) > 1 else arrays[0]
+
+
+@lru_cache(maxsize=128)
+def _cached_rsi(key: tuple, window: int) -> np.ndarray:
+    return _read_only(rsi_wilder(_PRICES[key][2], window))
+
+
+@lru_cache(maxsize=128)
+def _cached_bbands(key: tuple, window: int) -> tuple[np.ndarray, np.ndarray]:
+    return _read_only(*bbands(_PRICES[key][2], window))
+
+
+@lru_cache(maxsize=128)
+def _cached_stoch(key: tuple, window: int) -> np.ndarray:
+    high, low, close = _PRICES[key]
+    return _read_only(stoch_k(high, low, close, window))
+
+
+@lru_cache(maxsize=128)
+def _cached_macd(key: tuple, fast: int, slow: int, signal: int) -> tuple[np.ndarray, np.ndarray]:
+    return _read_only(*macd(_PRICES[key][2], fast, slow, signal))
+
+
+def calculate_indicators(df: pd.DataFrame, params: dict, trim_warmup: bool = True) -> pd.DataFrame:
     """
     Calcula un conjunto de indicadores técnicos y los añade como columnas a un DataFrame.
 
+    Los indicadores se calculan con los kernels compilados de `indicators_nb`,
+    que replican las definiciones de la librería `ta`, y se cachean por set de
+    datos y ventanas: entre pruebas de Optuna solo se recalculan los indicadores
+    cuyos parámetros cambian.
+
     Indicadores calculados:
     - RSI (Relative Strength Index)
     - Bandas de Bollinger (Bollinger Bands)
@@ -16,42 +83,44 @@ def calculate_indicators(df: pd.DataFrame, params: dict) -> pd.DataFrame:
         df (pd.DataFrame): DataFrame con datos de precios (OHLC). Debe contener
                            las columnas 'High', 'Low', y 'Close'.
         params (dict): Diccionario con los parámetros (ventanas, etc.) para cada indicador.
+        trim_warmup (bool): Si es `False` se conservan todas las velas, con NaN en
+                            las de calentamiento. Útil para calcular los indicadores
+                            una sola vez sobre un set y luego cortarlo en tramos.
 
     Returns:
         pd.DataFrame: Una copia del DataFrame original con las nuevas columnas de
-                      indicadores, eliminando las filas que puedan tener valores NaN
-                      resultantes del cálculo de las ventanas.
+                      indicadores, sin las velas de calentamiento de las ventanas
+                      (ni las que tengan el estocástico indefinido).
     """
-    df_copy = df.copy()
-
-    # RSI
-    df_copy['rsi'] = ta.momentum.RSIIndicator(
-        close=df_copy['Close'], window=params['rsi_window']
-    ).rsi()
-
-    # Bandas de Bollinger
-    bollinger = ta.volatility.BollingerBands(
-        close=df_copy['Close'], window=params['bb_window'], window_dev=2
-    )
-    df_copy['bb_high'] = bollinger.bollinger_hband()
-    df_copy['bb_low'] = bollinger.bollinger_lband()
-
-    # Oscilador Estocástico
-    stochastic = ta.momentum.StochasticOscillator(
-        high=df_copy['High'], low=df_copy['Low'], close=df_copy['Close'],
-        window=params['stoch_window'], smooth_window=params['stoch_smooth_k']
-    )
-    df_copy['stoch_k'] = stochastic.stoch()
-
-    # MACD
-    macd = ta.trend.MACD(
-        close=df_copy['Close'], window_slow=params['macd_long_window'],
-        window_fast=params['macd_short_window'], window_sign=params['macd_signal_window']
-    )
-    df_copy['macd_line'] = macd.macd()
-    df_copy['macd_signal_line'] = macd.macd_signal()
-
-    return df_copy.dropna()
+    key = _register_prices(df)
+    rsi_window = params['rsi_window']
+    bb_window = params['bb_window']
+    stoch_window = params['stoch_window']
+    macd_fast = params['macd_short_window']
+    macd_slow = params['macd_long_window']
+    macd_signal = params['macd_signal_window']
+
+    rsi = _cached_rsi(key, rsi_window)
+    bb_high, bb_low = _cached_bbands(key, bb_window)
+    stoch = _cached_stoch(key, stoch_window)
+    macd_line, macd_signal_line = _cached_macd(key, macd_fast, macd_slow, macd_signal)
+
+    # Velas de calentamiento: las ventanas aún no tienen suficientes datos.
+    warmup = max(rsi_window - 1, bb_window - 1, stoch_window - 1,
+                 max(macd_fast, macd_slow) + macd_signal - 2) if trim_warmup else 0
+
+    df_copy = df.iloc[warmup:].copy()
+    df_copy['rsi'] = rsi[warmup:]
+    df_copy['bb_high'] = bb_high[warmup:]
+    df_copy['bb_low'] = bb_low[warmup:]
+    df_copy['stoch_k'] = stoch[warmup:]
+    df_copy['macd_line'] = macd_line[warmup:]
+    df_copy['macd_signal_line'] = macd_signal_line[warmup:]
+
+    # Tras el calentamiento solo el estocástico puede quedar indefinido (rango nulo).
+    if trim_warmup and np.isnan(stoch[warmup:]).any():
+        df_copy = df_copy[~np.isnan(stoch[warmup:])]
+    return df_copy
 
 
 def generate_signals(df: pd.DataFrame, params: dict) -> pd.DataFrame:
@@ -75,35 +144,20 @@ def generate_signals(df: pd.DataFrame, params: dict) -> pd.DataFrame:
     """
     df_copy = df.copy()
 
-    # --- Señales Individuales de cada Indicador ---
-    rsi_buy = df_copy['rsi'] < params['rsi_lower']
-    rsi_sell = df_copy['rsi'] > params['rsi_upper']
-
-    bb_buy = df_copy['Close'] < df_copy['bb_low']
-    bb_sell = df_copy['Close'] > df_copy['bb_high']
-
-    stoch_buy = df_copy['stoch_k'] < params['stoch_buy_th']
-    stoch_sell = df_copy['stoch_k'] > params['stoch_sell_th']
-
-    macd_buy = df_copy['macd_line'] > df_copy['macd_signal_line']
-    macd_sell = df_copy['macd_line'] < df_copy['macd_signal_line']
-
-    # --- Consenso de Señales (2 de 4) ---
-    buy_signals = (
-            rsi_buy.astype(int) +
-            bb_buy.astype(int) +
-            stoch_buy.astype(int) +
-            macd_buy.astype(int)
-    )
-    sell_signals = (
-            rsi_sell.astype(int) +
-            bb_sell.astype(int) +
-            stoch_sell.astype(int) +
-            macd_sell.astype(int)
+    # --- Consenso de Señales (2 de 4), en una sola pasada compilada ---
+    buy_signal, sell_signal = signals_from_indicators(
+        df_copy['rsi'].to_numpy(),
+        df_copy['Close'].to_numpy(),
+        df_copy['bb_low'].to_numpy(),
+        df_copy['bb_high'].to_numpy(),
+        df_copy['stoch_k'].to_numpy(),
+        df_copy['macd_line'].to_numpy(),
+        df_copy['macd_signal_line'].to_numpy(),
+        float(params['rsi_lower']), float(params['rsi_upper']),
+        float(params['stoch_buy_th']), float(params['stoch_sell_th'])
     )
 
-    df_copy['buy_signal'] = buy_signals >= 2
-    df_copy['sell_signal'] = sell_signals >= 2
+    df_copy['buy_signal'] = buy_signal
+    df_copy['sell_signal'] = sell_signal
 
     return df_copy
-
@@ -0,0 +1,218 @@
+import numpy as np
+from _njit import njit
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _ema(x, alpha, min_periods, start):
+    """
+    Media móvil exponencial equivalente a `ewm(alpha=..., adjust=False).mean()`.
+
+    Args:
+        x (np.ndarray): Serie de entrada.
+        alpha (float): Factor de suavizado.
+        min_periods (int): Observaciones necesarias antes de emitir un valor.
+        start (int): Primera posición válida de `x` (las anteriores son NaN).
+
+    Returns:
+        np.ndarray: La media exponencial, con NaN durante el calentamiento.
+    """
+    n = x.shape[0]
+    out = np.full(n, np.nan, dtype=x.dtype)
+    if start >= n:
+        return out
+    old_wt = 1.0 - alpha
+    # `float()`: la recursión se acumula en float64 aunque `x` sea float32.
+    weighted = float(x[start])
+    for i in range(start, n):
+        if i > start:
+            weighted = (old_wt * weighted + alpha * float(x[i])) / (old_wt + alpha)
+        if i - start + 1 >= min_periods:
+            out[i] = weighted
+    return out
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def rsi_wilder(close, n):
+    """
+    RSI con el suavizado de Wilder (EWM con `alpha = 1 / n`).
+
+    Args:
+        close (np.ndarray): Precios de cierre.
+        n (int): Ventana del RSI.
+
+    Returns:
+        np.ndarray: El RSI (0-100), con NaN en las primeras `n - 1` velas.
+    """
+    size = close.shape[0]
+    up = np.zeros(size, dtype=close.dtype)
+    down = np.zeros(size, dtype=close.dtype)
+    for i in range(1, size):
+        diff = close[i] - close[i - 1]
+        if diff > 0:
+            up[i] = diff
+        elif diff < 0:
+            down[i] = -diff
+    ema_up = _ema(up, 1.0 / n, n, 0)
+    ema_down = _ema(down, 1.0 / n, n, 0)
+
+    rsi = np.full(size, np.nan, dtype=close.dtype)
+    for i in range(n - 1, size):
+        if ema_down[i] == 0:
+            rsi[i] = 100.0
+        else:
+            rsi[i] = 100.0 - 100.0 / (1.0 + ema_up[i] / ema_down[i])
+    return rsi
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def bbands(close, n):
+    """
+    Bandas de Bollinger a 2 desviaciones estándar (poblacionales).
+
+    La media y la varianza de la ventana se actualizan en O(1) por vela al
+    entrar un precio y salir otro (Welford deslizante, como `rolling` de pandas).
+
+    Args:
+        close (np.ndarray): Precios de cierre.
+        n (int): Ventana de la media móvil.
+
+    Returns:
+        tuple: Banda superior y banda inferior, con NaN en las primeras `n - 1` velas.
+    """
+    size = close.shape[0]
+    high = np.full(size, np.nan, dtype=close.dtype)
+    low = np.full(size, np.nan, dtype=close.dtype)
+    if size < n:
+        return high, low
+
+    # Primera ventana completa. Los acumuladores son float64 (`float()`) aunque
+    # los precios sean float32: el error de redondeo se arrastraría entre ventanas.
+    mean = 0.0
+    for j in range(n):
+        mean += float(close[j])
+    mean /= n
+    ssqdm = 0.0  # suma de cuadrados de las desviaciones respecto a la media
+    for j in range(n):
+        ssqdm += (float(close[j]) - mean) ** 2
+
+    for i in range(n - 1, size):
+        if i >= n:
+            new = float(close[i])
+            old = float(close[i - n])
+            new_mean = mean + (new - old) / n
+            ssqdm += (new - old) * (new - new_mean + old - mean)
+            mean = new_mean
+            if ssqdm < 0.0:
+                ssqdm = 0.0
+        std = np.sqrt(ssqdm / n)
+        high[i] = mean + 2 * std
+        low[i] = mean - 2 * std
+    return high, low
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _rolling_extremes(high, low, n):
+    """
+    Máximo de `high` y mínimo de `low` en cada ventana de `n` velas (van Herk /
+    Gil-Werman): con los extremos acumulados hacia adelante y hacia atrás dentro
+    de bloques de `n` velas, cada ventana se resuelve con una sola comparación,
+    así que el costo es O(N) independientemente de la ventana.
+
+    Returns:
+        tuple: Máximos y mínimos de cada ventana que termina en la vela `i`
+               (válidos desde `i = n - 1`).
+    """
+    size = high.shape[0]
+    prefix_max = np.empty(size, dtype=high.dtype)
+    prefix_min = np.empty(size, dtype=low.dtype)
+    suffix_max = np.empty(size, dtype=high.dtype)
+    suffix_min = np.empty(size, dtype=low.dtype)
+    for block_start in range(0, size, n):
+        block_end = min(block_start + n, size)
+        prefix_max[block_start] = high[block_start]
+        prefix_min[block_start] = low[block_start]
+        for i in range(block_start + 1, block_end):
+            prefix_max[i] = max(prefix_max[i - 1], high[i])
+            prefix_min[i] = min(prefix_min[i - 1], low[i])
+        suffix_max[block_end - 1] = high[block_end - 1]
+        suffix_min[block_end - 1] = low[block_end - 1]
+        for i in range(block_end - 2, block_start - 1, -1):
+            suffix_max[i] = max(suffix_max[i + 1], high[i])
+            suffix_min[i] = min(suffix_min[i + 1], low[i])
+
+    highest = np.empty(size, dtype=high.dtype)
+    lowest = np.empty(size, dtype=low.dtype)
+    for i in range(n - 1, size):
+        # La ventana [i - n + 1, i] abarca a lo sumo dos bloques consecutivos.
+        highest[i] = max(suffix_max[i - n + 1], prefix_max[i])
+        lowest[i] = min(suffix_min[i - n + 1], prefix_min[i])
+    return highest, lowest
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def stoch_k(high, low, close, n):
+    """
+    Oscilador Estocástico %K (sin suavizar).
+
+    Args:
+        high (np.ndarray): Precios máximos.
+        low (np.ndarray): Precios mínimos.
+        close (np.ndarray): Precios de cierre.
+        n (int): Ventana del oscilador.
+
+    Returns:
+        np.ndarray: El %K (0-100), con NaN en las primeras `n - 1` velas y en
+                    las velas cuyo rango máximo-mínimo es nulo.
+    """
+    size = close.shape[0]
+    k = np.full(size, np.nan, dtype=close.dtype)
+    highest, lowest = _rolling_extremes(high, low, n)
+    for i in range(n - 1, size):
+        # Rango nulo (0 / 0): se deja NaN, igual que la división en pandas.
+        if highest[i] != lowest[i]:
+            k[i] = 100 * (close[i] - lowest[i]) / (highest[i] - lowest[i])
+    return k
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def macd(close, fast, slow, signal):
+    """
+    MACD: diferencia de EMAs rápida y lenta, y su línea de señal.
+
+    Args:
+        close (np.ndarray): Precios de cierre.
+        fast (int): Ventana de la EMA rápida.
+        slow (int): Ventana de la EMA lenta.
+        signal (int): Ventana de la EMA de la línea de señal.
+
+    Returns:
+        tuple: Línea MACD y línea de señal, con NaN durante el calentamiento
+               (`max(fast, slow) - 1` y `max(fast, slow) + signal - 2` velas).
+    """
+    macd_line = _ema(close, 2.0 / (fast + 1), fast, 0) - _ema(close, 2.0 / (slow + 1), slow, 0)
+    signal_line = _ema(macd_line, 2.0 / (signal + 1), signal, max(fast, slow) - 1)
+    return macd_line, signal_line
+
+
+@njit(cache=True, nogil=True)
+def signals_from_indicators(rsi, close, bb_low, bb_high, stoch, macd_line, macd_signal_line,
+                            rsi_lower, rsi_upper, stoch_buy_th, stoch_sell_th):
+    """
+    Genera las señales de compra y venta por consenso (2 de 4 indicadores) en
+    una sola pasada, sin arreglos intermedios por indicador.
+
+    Returns:
+        tuple: Arreglos booleanos de señales de compra y de venta.
+    """
+    n = close.shape[0]
+    buy = np.empty(n, dtype=np.bool_)
+    sell = np.empty(n, dtype=np.bool_)
+    for i in range(n):
+        # `int()` explícito: sin compilar, sumar `np.bool_` sería un OR lógico.
+        buy_votes = (int(rsi[i] < rsi_lower) + int(close[i] < bb_low[i]) +
+                     int(stoch[i] < stoch_buy_th) + int(macd_line[i] > macd_signal_line[i]))
+        sell_votes = (int(rsi[i] > rsi_upper) + int(close[i] > bb_high[i]) +
+                      int(stoch[i] > stoch_sell_th) + int(macd_line[i] < macd_signal_line[i]))
+        buy[i] = buy_votes >= 2
+        sell[i] = sell_votes >= 2
+    return buy, sell
@@ -1,8 +1,11 @@
+import os
+import numpy as np
 import pandas as pd
 from utils import load_and_split_data, display_final_results
-from optimize import run_optimization
+from optimize import run_optimization, journal_storage
 from backtesting import run_backtest
 from plots import (
+    pyplot,
     plot_single_period_performance,
     plot_split_performance,
     plot_performance_vs_buy_and_hold
@@ -18,7 +21,10 @@ def main():
     1.  Define las configuraciones iniciales (archivo de datos, capital, comisiones).
     2.  Carga y divide los datos históricos en sets de entrenamiento, prueba y validación.
     3.  Ejecuta la optimización de hiperparámetros en el set de entrenamiento
-        utilizando Optuna con validación cruzada (walk-forward).
+        utilizando Optuna con validación cruzada (walk-forward), evaluando
+        pruebas en paralelo en todos los núcleos disponibles. El estudio se
+        guarda en un journal, así que cada ejecución continúa las pruebas de
+        las anteriores.
     4.  Imprime los mejores parámetros encontrados.
     5.  Ejecuta el backtest final con los parámetros óptimos en cada uno de los
         tres sets de datos (Train, Test, Validation).
@@ -31,16 +37,20 @@ def main():
     COMMISSION = 0.00125
     N_TRIALS = 250
     N_SPLITS = 5
+    N_JOBS = os.cpu_count()
+    STUDY_FILE = 'optuna.log'
+    STUDY_NAME = 'btc_hourly'
 
     # --- 2. Carga y División de Datos ---
-    train_df, test_df, validation_df = load_and_split_data(
-        DATA_FILE, train_ratio=0.6, test_ratio=0.2
+    train_df, test_df, validation_df, arrays = load_and_split_data(
+        DATA_FILE, train_ratio=0.6, test_ratio=0.2, columns=['High', 'Low', 'Close']
     )
     if train_df is None:
         return
 
     # --- 3. Optimización de Hiperparámetros ---
-    study = run_optimization(train_df, n_trials=N_TRIALS, n_splits=N_SPLITS)
+    study = run_optimization(train_df, n_trials=N_TRIALS, n_splits=N_SPLITS, n_jobs=N_JOBS,
+                             storage=journal_storage(STUDY_FILE), study_name=STUDY_NAME)
     print(f"\nOptimización completada. Mejor Calmar Ratio promedio: {study.best_value:.4f}")
     best_params = study.best_params
 
@@ -72,22 +82,34 @@ def main():
     # --- 5. Generación de Gráficas Finales ---
     print("\nGenerando gráficas de rendimiento...")
 
-    # 1. Gráfica del periodo Train
-    plot_single_period_performance(train_portfolio, title="Rendimiento en Periodo de Entrenamiento")
-
-    # 2. Gráfica del periodo Test
-    plot_single_period_performance(test_portfolio, title="Rendimiento en Periodo de Test")
-
-    # 3. Gráfica del periodo Validation
-    plot_single_period_performance(validation_portfolio, title="Rendimiento en Periodo de Validation")
+    # 1-3. Gráficas de los periodos Train, Test y Validation en una sola figura
+    plt = pyplot()
+    fig, axes = plt.subplots(3, 1, figsize=(10, 15))
+    plot_single_period_performance(train_portfolio, title="Rendimiento en Periodo de Entrenamiento",
+                                   ax=axes[0])
+    plot_single_period_performance(test_portfolio, title="Rendimiento en Periodo de Test", ax=axes[1])
+    plot_single_period_performance(validation_portfolio, title="Rendimiento en Periodo de Validation",
+                                   ax=axes[2])
+    fig.tight_layout()
+    plt.show()
 
     # 4. Gráfica combinada Test y Validation
     plot_split_performance(test_portfolio, validation_portfolio)
 
     # 5. Gráfica comparativa vs. Buy & Hold
-    full_test_validation_portfolio = pd.concat([test_portfolio, validation_portfolio])
-    full_prices = pd.concat([test_df['Close'], validation_df['Close']])
-    plot_performance_vs_buy_and_hold(full_test_validation_portfolio, full_prices, INITIAL_CASH)
+    # Series combinadas construidas directamente desde los arreglos (sin `pd.concat`).
+    full_test_validation_portfolio = pd.Series(
+        np.concatenate([test_portfolio.to_numpy(), validation_portfolio.to_numpy()]),
+        index=test_portfolio.index.append(validation_portfolio.index), name=test_portfolio.name
+    )
+    # Comprar y Mantener calculado sobre el arreglo de precios, en float64 como
+    # el portafolio (los precios vienen en float32).
+    full_prices = np.concatenate([arrays['test_close'], arrays['validation_close']])
+    buy_and_hold_portfolio = pd.Series(
+        np.multiply(INITIAL_CASH / float(full_prices[0]), full_prices, dtype=np.float64),
+        index=test_df.index.append(validation_df.index), name='value', copy=False
+    )
+    plot_performance_vs_buy_and_hold(full_test_validation_portfolio, buy_and_hold_portfolio)
 
 
 if __name__ == "__main__":
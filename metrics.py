@@ -1,35 +1,92 @@
 import pandas as pd
 import numpy as np
+from _njit import njit
 
 
-def calculate_calmar_for_optimization(portfolio_values: pd.Series) -> float:
+@njit(cache=True, nogil=True, error_model='numpy')
+def _all_metrics(values):
+    """
+    Calcula en una sola pasada sobre `values` las estadísticas de sus rendimientos
+    simples y el máximo drawdown. Las varianzas se acumulan con el método de
+    Welford (estable en una pasada) y con `ddof=1`, como `pd.Series.std`.
+
+    Con `error_model='numpy'` una división entre un valor nulo del portafolio da
+    `inf`/NaN (como `pct_change` en pandas) en lugar de lanzar `ZeroDivisionError`.
+
+    Args:
+        values (np.ndarray): Valores del portafolio (float64), al menos dos.
+
+    Returns:
+        tuple: Rendimiento medio, desviación estándar de los rendimientos,
+               desviación estándar de los rendimientos negativos (0 si no hay
+               ninguno) y máximo drawdown. Las desviaciones son NaN si solo
+               hay una observación.
+    """
+    n_returns = 0
+    total = 0.0  # el rendimiento medio es `total / n`, como `pd.Series.mean`
+    mean = 0.0
+    m2 = 0.0
+    n_downside = 0
+    downside_mean = 0.0
+    downside_m2 = 0.0
+    cumulative_max = values[0]
+    max_drawdown = 0.0
+    for i in range(1, values.shape[0]):
+        r = (values[i] - values[i - 1]) / values[i - 1]
+        # 0 / 0 (dos valores nulos seguidos) da NaN: se omite, como con `dropna`.
+        if not np.isnan(r):
+            n_returns += 1
+            total += r
+            delta = r - mean
+            mean += delta / n_returns
+            m2 += delta * (r - mean)
+            if r < 0:
+                n_downside += 1
+                delta = r - downside_mean
+                downside_mean += delta / n_downside
+                downside_m2 += delta * (r - downside_mean)
+
+        if values[i] > cumulative_max:
+            cumulative_max = values[i]
+        drawdown = (cumulative_max - values[i]) / cumulative_max
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+
+    std = np.sqrt(m2 / (n_returns - 1)) if n_returns > 1 else np.nan
+    if n_downside == 0:
+        downside_std = 0.0
+    else:
+        downside_std = np.sqrt(downside_m2 / (n_downside - 1)) if n_downside > 1 else np.nan
+    # La media de Welford se vuelve NaN con un rendimiento infinito (inf - inf);
+    # la suma conserva el `-inf` que daba pandas.
+    mean_return = total / n_returns if n_returns > 0 else np.nan
+    return mean_return, std, downside_std, max_drawdown
+
+
+def calculate_calmar_for_optimization(portfolio_values: pd.Series | np.ndarray) -> float:
     """
     Calcula únicamente el Calmar Ratio de una serie de valores de portafolio.
 
     Esta es una versión ligera diseñada para ser usada de forma eficiente y repetida
-    dentro del bucle de optimización de Optuna.
+    dentro del bucle de optimización de Optuna: recorre el arreglo de valores una
+    sola vez en el kernel compilado `_all_metrics`, sin crear Series intermedias.
 
     Args:
-        portfolio_values (pd.Series): La serie temporal del valor del portafolio.
+        portfolio_values (pd.Series | np.ndarray): La serie temporal del valor del portafolio.
 
     Returns:
         float: El valor del Calmar Ratio calculado. Retorna -1.0 si el cálculo
                no es posible (ej. no hay suficientes datos).
     """
-    if portfolio_values.empty or portfolio_values.nunique() < 2:
-        return -1.0
-    returns = portfolio_values.pct_change().dropna()
-    if returns.empty:
+    values = np.asarray(portfolio_values, dtype=np.float64)
+    if values.size < 2 or values.min() == values.max():
         return -1.0
+    mean_return, _, _, max_drawdown = _all_metrics(values)
+    annualized_return = mean_return * (24 * 365)
+    return float(annualized_return / max_drawdown) if max_drawdown > 0 else -1.0
 
-    annualized_return = returns.mean() * (24 * 365)
-    cumulative_max = portfolio_values.cummax()
-    drawdown = (cumulative_max - portfolio_values) / cumulative_max
-    max_drawdown = drawdown.max()
-    return annualized_return / max_drawdown if max_drawdown > 0 else -1.0
 
-
-def calculate_full_performance_metrics(portfolio_values: pd.Series, trades_log: list, time_frame_minutes: int) -> dict:
+def calculate_full_performance_metrics(portfolio_values: pd.Series, trades_log: np.ndarray, time_frame_minutes: int) -> dict:
     """
     Calcula un diccionario completo con las métricas de desempeño de la estrategia.
 
@@ -38,7 +95,7 @@ def calculate_full_performance_metrics(portfolio_values: pd.Series, trades_log:
 
     Args:
         portfolio_values (pd.Series): La serie temporal del valor del portafolio.
-        trades_log (list): Una lista de objetos `Operation` que han sido cerrados.
+        trades_log (np.ndarray): Las operaciones cerradas (arreglo con `TRADE_DTYPE`).
         time_frame_minutes (int): La duración de cada vela en minutos (ej. 60 para
                                   datos horarios), usada para la anualización.
 
@@ -50,31 +107,32 @@ def calculate_full_performance_metrics(portfolio_values: pd.Series, trades_log:
         return {'Calmar Ratio': 0.0, 'Sharpe Ratio': 0.0, 'Sortino Ratio': 0.0, 'Max Drawdown': 0.0, 'Win Rate': 0.0,
                 'Total Trades': 0, 'Annualized Return': 0.0}
 
-    returns = portfolio_values.pct_change().dropna()
-    if returns.empty:
+    values = portfolio_values.to_numpy(dtype=np.float64)
+    if values.size < 2:
         return {'Calmar Ratio': 0.0, 'Sharpe Ratio': 0.0, 'Sortino Ratio': 0.0, 'Max Drawdown': 0.0, 'Win Rate': 0.0,
                 'Total Trades': len(trades_log), 'Annualized Return': 0.0}
 
-    # --- Cálculos de Métricas ---
+    # --- Cálculos de Métricas (una sola pasada compilada) ---
+    mean_return, std_dev, downside_std, max_drawdown = _all_metrics(values)
     bars_per_year = (24 * 60 / time_frame_minutes) * 365
-    annualized_return = returns.mean() * bars_per_year
-    annualized_std_dev = returns.std() * np.sqrt(bars_per_year)
+    annualized_return = mean_return * bars_per_year
+    annualized_std_dev = std_dev * np.sqrt(bars_per_year)
     sharpe_ratio = annualized_return / annualized_std_dev if annualized_std_dev != 0 else 0.0
-    downside_returns = returns[returns < 0]
-    annualized_downside_risk = (downside_returns.std() if not downside_returns.empty else 0) * np.sqrt(bars_per_year)
+    annualized_downside_risk = downside_std * np.sqrt(bars_per_year)
     sortino_ratio = annualized_return / annualized_downside_risk if annualized_downside_risk != 0 else 0.0
-    cumulative_max = portfolio_values.cummax()
-    drawdown = (cumulative_max - portfolio_values) / cumulative_max
-    max_drawdown = drawdown.max()
     calmar_ratio = annualized_return / max_drawdown if max_drawdown > 0 else 0.0
 
     # --- Desglose de Win Rate ---
-    long_trades = [trade for trade in trades_log if trade.type == 'LONG']
-    short_trades = [trade for trade in trades_log if trade.type == 'SHORT']
-
-    win_rate_general = sum(1 for trade in trades_log if trade.pnl > 0) / len(trades_log) if trades_log else 0.0
-    win_rate_long = sum(1 for trade in long_trades if trade.pnl > 0) / len(long_trades) if long_trades else 0.0
-    win_rate_short = sum(1 for trade in short_trades if trade.pnl > 0) / len(short_trades) if short_trades else 0.0
+    n_trades = len(trades_log)
+    is_long = trades_log['type'] == 'LONG'
+    is_short = ~is_long
+    wins = trades_log['pnl'] > 0
+    n_long = np.count_nonzero(is_long)
+    n_short = n_trades - n_long
+
+    win_rate_general = np.count_nonzero(wins) / n_trades
+    win_rate_long = np.count_nonzero(wins & is_long) / n_long if n_long else 0.0
+    win_rate_short = np.count_nonzero(wins & is_short) / n_short if n_short else 0.0
 
     # --- Construcción del diccionario final de métricas ---
     metrics = {
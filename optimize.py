@@ -1,8 +1,14 @@
+import os
+import tempfile
+import joblib
 import optuna
 import numpy as np
 import pandas as pd
+from optuna.storages import BaseStorage, JournalStorage
+from optuna.storages.journal import JournalFileBackend
 from sklearn.model_selection import TimeSeriesSplit
-from backtesting import run_backtest
+from backtesting import run_backtest_splits
+from get_signals import calculate_indicators, generate_signals
 from metrics import calculate_calmar_for_optimization
 
 
@@ -20,18 +26,20 @@ def get_params_from_trial(trial: optuna.trial.Trial) -> dict:
     Returns:
         dict: Un diccionario con un conjunto de parámetros sugeridos para una prueba.
     """
+    # Las ventanas se muestrean en una rejilla gruesa: ventanas vecinas dan señales
+    # casi idénticas y así el espacio efectivo es menor. Los rangos de MACD no se
+    # solapan, por lo que la ventana corta siempre es menor que la larga.
     return {
-        'rsi_window': trial.suggest_int('rsi_window', 5, 50),
+        'rsi_window': trial.suggest_int('rsi_window', 5, 50, step=5),
         'rsi_lower': trial.suggest_int('rsi_lower', 5, 35),
         'rsi_upper': trial.suggest_int('rsi_upper', 65, 95),
-        'bb_window': trial.suggest_int('bb_window', 10, 50),
-        'stoch_window': trial.suggest_int('stoch_window', 10, 50),
-        'stoch_smooth_k': trial.suggest_int('stoch_smooth_k', 3, 10),
+        'bb_window': trial.suggest_int('bb_window', 10, 50, step=5),
+        'stoch_window': trial.suggest_int('stoch_window', 10, 50, step=5),
         'stoch_buy_th': trial.suggest_int('stoch_buy_th', 10, 30),
         'stoch_sell_th': trial.suggest_int('stoch_sell_th', 70, 90),
-        'macd_short_window': trial.suggest_int('macd_short_window', 5, 50),
-        'macd_long_window': trial.suggest_int('macd_long_window', 100, 300),
-        'macd_signal_window': trial.suggest_int('macd_signal_window', 5, 50),
+        'macd_short_window': trial.suggest_int('macd_short_window', 5, 50, step=5),
+        'macd_long_window': trial.suggest_int('macd_long_window', 100, 300, step=10),
+        'macd_signal_window': trial.suggest_int('macd_signal_window', 5, 50, step=5),
         'stop_loss': trial.suggest_float('stop_loss', 0.01, 0.15),
         'take_profit': trial.suggest_float('take_profit', 0.01, 0.15),
         # 'n_shares': trial.suggest_float('n_shares', 0.5, 10.0), # No da resultados buenos
@@ -40,7 +48,25 @@ def get_params_from_trial(trial: optuna.trial.Trial) -> dict:
     }
 
 
-def objective(trial: optuna.trial.Trial, data: pd.DataFrame, n_splits: int) -> float:
+def _walk_forward_splits(data: pd.DataFrame, n_splits: int) -> list[tuple[np.ndarray, pd.DataFrame]]:
+    """
+    Calcula las divisiones walk-forward de `data`. Solo dependen del tamaño del
+    set y de `n_splits`, así que se calculan una vez para toda la optimización.
+
+    Args:
+        data (pd.DataFrame): El set de datos de entrenamiento.
+        n_splits (int): Número de divisiones para la validación cruzada (walk-forward).
+
+    Returns:
+        list[tuple[np.ndarray, pd.DataFrame]]: Por cada división, las posiciones
+        de sus velas dentro de `data` y el tramo correspondiente.
+    """
+    tscv = TimeSeriesSplit(n_splits=n_splits)
+    return [(test_index, data.iloc[test_index]) for _, test_index in tscv.split(data)]
+
+
+def objective(trial: optuna.trial.Trial, data: pd.DataFrame,
+              splits: list[tuple[np.ndarray, pd.DataFrame]], parallel_splits: bool = False) -> float:
     """
     Función objetivo que Optuna evalúa y maximiza, usando la metodología walk-forward.
 
@@ -48,39 +74,156 @@ def objective(trial: optuna.trial.Trial, data: pd.DataFrame, n_splits: int) -> f
     de tiempo del set de datos y retorna el promedio del Calmar Ratio, penalizando
     las pruebas con muy pocas operaciones.
 
+    Las señales se calculan una sola vez sobre todo `data` y cada división toma
+    su tramo: así las divisiones heredan el calentamiento de los indicadores de
+    las velas previas en lugar de descartar sus primeras velas.
+
+    El promedio acumulado del Calmar se reporta a Optuna tras cada división (es
+    el mismo valor que retorna la función al final), de modo que el pruner puede
+    abortar la prueba sin evaluar las divisiones restantes.
+    Con `parallel_splits` todas las divisiones se simulan a la vez en los hilos
+    de Numba; el pruner sigue marcando la prueba, pero ya no ahorra cómputo.
+
     Args:
         trial (optuna.trial.Trial): La prueba actual de Optuna que se está evaluando.
         data (pd.DataFrame): El set de datos de entrenamiento sobre el cual se
                              realizará la validación cruzada.
-        n_splits (int): Número de divisiones para la validación cruzada (walk-forward).
+        splits (list[tuple[np.ndarray, pd.DataFrame]]): Divisiones walk-forward de
+                             `data`, calculadas con `_walk_forward_splits`.
+        parallel_splits (bool): Si es `True`, simula las divisiones en paralelo.
 
     Returns:
         float: El valor promedio de la métrica (Calmar Ratio) en todas las divisiones.
+
+    Raises:
+        optuna.TrialPruned: Si el pruner decide detener la prueba tras alguna división.
     """
-    tscv = TimeSeriesSplit(n_splits=n_splits)
     results = []
     params = get_params_from_trial(trial)
 
-    for _, test_index in tscv.split(data):
-        validation_set = data.iloc[test_index]
-        _, portfolio_df, trades_log, _ = run_backtest(validation_set, 1_000_000, 0.00125, params)
-        if len(trades_log) < 10:
-            results.append(-1.0)
-            continue
-        results.append(calculate_calmar_for_optimization(portfolio_df))
+    signals = generate_signals(calculate_indicators(data, params, trim_warmup=False), params)
+    # Velas con todos los indicadores definidos (fuera del calentamiento inicial y sin rango nulo).
+    indicator_columns = ['rsi', 'bb_high', 'bb_low', 'stoch_k', 'macd_line', 'macd_signal_line']
+    valid = signals[indicator_columns].notna().all(axis=1).to_numpy()
+
+    def score(portfolio_df: pd.Series, n_trades: int) -> float:
+        return -1.0 if n_trades < 10 else calculate_calmar_for_optimization(portfolio_df)
+
+    if parallel_splits:
+        split_results = run_backtest_splits(
+            [validation_set for _, validation_set in splits], 1_000_000, 0.00125, params,
+            [signals.iloc[test_index[valid[test_index]]] for test_index, _ in splits]
+        )
+        split_scores = (score(portfolio_df, n_trades) for portfolio_df, n_trades in split_results)
+    else:
+        def sequential_scores():
+            for test_index, validation_set in splits:
+                split_signals = signals.iloc[test_index[valid[test_index]]]
+                # Solo se necesitan los valores y el número de operaciones: no se
+                # construye el registro de las operaciones. `parallel=False`: sin
+                # los hilos de Numba, que saturarían la CPU con varios procesos.
+                [(portfolio_df, n_trades)] = run_backtest_splits(
+                    [validation_set], 1_000_000, 0.00125, params, [split_signals], parallel=False
+                )
+                yield score(portfolio_df, n_trades)
+
+        # Generador: una división solo se simula si el pruner no detuvo la prueba antes.
+        split_scores = sequential_scores()
+
+    for split_idx, split_score in enumerate(split_scores):
+        results.append(split_score)
+        trial.report(np.mean(results), step=split_idx)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
 
     return np.mean(results)
 
 
-def run_optimization(train_df: pd.DataFrame, n_trials: int, n_splits: int) -> optuna.study.Study:
+def _create_sampler_and_pruner() -> tuple:
+    """
+    Crea el sampler y el pruner del estudio. Optuna no los guarda en el
+    almacenamiento, así que cada proceso que abre el estudio los vuelve a crear.
+
+    Returns:
+        tuple: El sampler CMA-ES y el pruner de mediana.
+    """
+    # CMA-ES: su costo por sugerencia no crece con el número de pruebas (TPE sí),
+    # y converge mejor en este espacio numérico de 14 dimensiones. Las primeras
+    # pruebas se muestrean al azar para arrancar la distribución.
+    sampler = optuna.samplers.CmaEsSampler(n_startup_trials=20, warn_independent_sampling=False)
+    # Se poda una prueba cuyo promedio parcial queda bajo la mediana de las
+    # anteriores en la misma división, a partir de la segunda división.
+    pruner = optuna.pruners.MedianPruner(n_startup_trials=10, n_warmup_steps=1)
+    return sampler, pruner
+
+
+def journal_storage(file_path: str) -> JournalStorage:
+    """
+    Crea un almacenamiento de Optuna respaldado por un archivo de registro (journal).
+
+    A diferencia de SQLite, el journal no sufre contención de bloqueos cuando
+    varios procesos escriben pruebas a la vez, y permite reanudar el estudio en
+    ejecuciones posteriores.
+
+    Args:
+        file_path (str): Ruta del archivo de registro del estudio.
+
+    Returns:
+        JournalStorage: El almacenamiento listo para `create_study`/`load_study`.
+    """
+    return JournalStorage(JournalFileBackend(file_path))
+
+
+def _optimize_worker(storage: str | BaseStorage, study_name: str, train_df: pd.DataFrame, n_trials: int,
+                     splits: list[tuple[np.ndarray, pd.DataFrame]]) -> None:
+    """
+    Proceso trabajador: abre el estudio compartido y evalúa `n_trials` pruebas.
+
+    Args:
+        storage (str | BaseStorage): Almacenamiento compartido del estudio.
+        study_name (str): Nombre del estudio dentro del almacenamiento.
+        train_df (pd.DataFrame): El set de datos de entrenamiento.
+        n_trials (int): Número de pruebas que evalúa este proceso.
+        splits (list[tuple[np.ndarray, pd.DataFrame]]): Divisiones walk-forward de `train_df`.
+    """
+    # Cada proceso tiene su propio logger: sin esto imprimiría una línea por prueba.
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    sampler, pruner = _create_sampler_and_pruner()
+    study = optuna.load_study(study_name=study_name, storage=storage, sampler=sampler, pruner=pruner)
+    # Los demás procesos ocupan el resto de los núcleos: las divisiones se evalúan en serie.
+    study.optimize(lambda trial: objective(trial, train_df, splits), n_trials=n_trials)
+
+
+def run_optimization(train_df: pd.DataFrame, n_trials: int, n_splits: int, n_jobs: int = 1,
+                     storage: str | BaseStorage | None = None,
+                     study_name: str = 'walk_forward') -> optuna.study.Study:
     """
     Configura y ejecuta el estudio completo de optimización de hiperparámetros.
 
+    Las pruebas son independientes entre sí, por lo que con `n_jobs > 1` se
+    reparten entre procesos (joblib/loky) que comparten el estudio a través de
+    un almacenamiento: el de `storage` o, si no se indica, un journal temporal
+    cuyo contenido se copia a memoria al terminar. Al ser procesos, la
+    parte en Python de cada prueba no compite por el GIL. Las combinaciones se
+    proponen con un sampler CMA-ES, y un pruner de mediana descarta pronto las
+    pruebas poco prometedoras.
+
+    Con `n_jobs == 1` los núcleos quedan libres, así que cada prueba simula sus
+    divisiones en paralelo; con varios procesos las divisiones se evalúan en
+    serie para no saturar la CPU con los hilos de Numba de cada prueba.
+
     Args:
         train_df (pd.DataFrame): El set de datos de entrenamiento para la optimización.
         n_trials (int): Número total de combinaciones de hiperparámetros que Optuna probará.
         n_splits (int): Número de divisiones a utilizar en el walk-forward
                         dentro de cada prueba de la optimización.
+        n_jobs (int): Número de procesos que evalúan pruebas en paralelo (-1 para
+                      usar todos los núcleos).
+        storage (str | BaseStorage | None): Almacenamiento del estudio: una URL
+                              (ej. 'sqlite:///study.db') o un objeto de Optuna
+                              (ej. `journal_storage('optuna.log')`). Si es `None`,
+                              el estudio se mantiene en memoria.
+        study_name (str): Nombre del estudio dentro del almacenamiento; si ya existe, se reanuda.
 
     Returns:
         optuna.study.Study: El objeto de estudio de Optuna que contiene todos los
@@ -88,11 +231,40 @@ def run_optimization(train_df: pd.DataFrame, n_trials: int, n_splits: int) -> op
                             parámetros y el mejor valor de la métrica objetivo.
     """
     print("\nIniciando optimización walk-forward...")
-    study = optuna.create_study(direction='maximize')
-    study.optimize(
-        lambda trial: objective(trial, train_df, n_splits=n_splits),
-        n_trials=n_trials,
-        show_progress_bar=True
-    )
-    return study
+    # Solo advertencias: el progreso se sigue con la barra (un proceso) y el mejor
+    # resultado se reporta al terminar.
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    n_workers = min(joblib.cpu_count() if n_jobs == -1 else n_jobs, n_trials)
+    splits = _walk_forward_splits(train_df, n_splits)
+
+    if n_workers <= 1:
+        sampler, pruner = _create_sampler_and_pruner()
+        study = optuna.create_study(direction='maximize', sampler=sampler, pruner=pruner,
+                                    storage=storage, study_name=study_name, load_if_exists=True)
+        study.optimize(
+            lambda trial: objective(trial, train_df, splits, parallel_splits=True),
+            n_trials=n_trials,
+            show_progress_bar=True
+        )
+        return study
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shared_storage = storage or journal_storage(os.path.join(tmp_dir, 'study.log'))
+        optuna.create_study(direction='maximize', storage=shared_storage, study_name=study_name,
+                            load_if_exists=True)
+
+        base, extra = divmod(n_trials, n_workers)
+        joblib.Parallel(n_jobs=n_workers, backend='loky')(
+            joblib.delayed(_optimize_worker)(shared_storage, study_name, train_df,
+                                             base + (worker < extra), splits)
+            for worker in range(n_workers)
+        )
 
+        if storage is None:
+            in_memory = optuna.storages.InMemoryStorage()
+            optuna.copy_study(from_study_name=study_name, from_storage=shared_storage,
+                              to_storage=in_memory)
+            shared_storage = in_memory
+        sampler, pruner = _create_sampler_and_pruner()
+        return optuna.load_study(study_name=study_name, storage=shared_storage,
+                                 sampler=sampler, pruner=pruner)
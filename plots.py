@@ -1,55 +1,161 @@
 # plots.py
-import matplotlib.pyplot as plt
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+import numpy as np
 import pandas as pd
-import seaborn as sns
 
-# Configuración global de estilo para todos los gráficos del módulo
-sns.set_theme(style="whitegrid")
-plt.rcParams['figure.figsize'] = [10, 5]
-plt.rcParams['axes.grid'] = True
-plt.rcParams['axes.prop_cycle'] = plt.cycler(
-    color=["skyblue", "steelblue", "navy", "royalblue", "mediumslateblue"]
-)
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
+
+# matplotlib y seaborn se importan en el primer gráfico (ver `pyplot`): los
+# flujos que no grafican (optimización, métricas) no pagan su importación.
+_pyplot = None
+
+
+def pyplot():
+    """
+    Devuelve `matplotlib.pyplot`, importándolo y aplicando la configuración de
+    estilo del módulo la primera vez que se llama.
+
+    Si la variable de entorno `MPL_HEADLESS` está definida se usa el backend
+    Agg (sin interfaz gráfica, ej. reportes en lote), que debe elegirse antes
+    de importar `pyplot`.
+
+    Returns:
+        module: El módulo `matplotlib.pyplot` ya configurado.
+    """
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        if os.environ.get('MPL_HEADLESS'):
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Configuración global de estilo para todos los gráficos del módulo
+        sns.set_theme(style="whitegrid")
+        plt.rcParams.update({
+            'figure.figsize': [10, 5],
+            'axes.grid': True,
+            'axes.prop_cycle': plt.cycler(color=["skyblue", "steelblue", "navy", "royalblue", "mediumslateblue"]),
+        })
+        _pyplot = plt
+    return _pyplot
+
+
+def _downsample(series: pd.Series, max_points: int = 4_000, threshold: int = 5_000) -> pd.Series:
+    """
+    Reduce una serie larga antes de graficarla: la pantalla no distingue más
+    puntos que su ancho en píxeles. En cada tramo de la serie se conservan su
+    mínimo y su máximo (y los extremos de la serie), así que los picos y las
+    caídas se siguen viendo, a diferencia de tomar un punto de cada tantos.
+
+    Args:
+        series (pd.Series): Serie a graficar.
+        max_points (int): Número aproximado de puntos a conservar.
+        threshold (int): Longitud a partir de la cual se reduce la serie.
+
+    Returns:
+        pd.Series: La serie reducida (o la original si no supera `threshold`).
+    """
+    n = len(series)
+    if n <= threshold:
+        return series
+    bucket = -(-2 * n // max_points)  # dos puntos (mínimo y máximo) por tramo
+    n_full = n - n % bucket
+    blocks = series.to_numpy()[:n_full].reshape(-1, bucket)
+    starts = np.arange(0, n_full, bucket)
+    keep = np.unique(np.concatenate([
+        starts + blocks.argmin(axis=1), starts + blocks.argmax(axis=1),
+        np.arange(n_full, n), [0, n - 1]
+    ]))
+    return series.iloc[keep]
+
 
-def plot_single_period_performance(portfolio_values: pd.Series, title: str):
+def _finish(ax: plt.Axes, own_figure: bool, save_path: str | None):
+    """
+    Guarda la figura en `save_path` si se indica; si no, muestra la figura
+    cuando la creó la propia función de graficado (`own_figure`).
+    """
+    plt = pyplot()
+    if save_path is not None:
+        ax.figure.savefig(save_path, dpi=90)
+        if own_figure:
+            plt.close(ax.figure)
+    elif own_figure:
+        plt.show()
+
+
+def plot_single_period_performance(portfolio_values: pd.Series, title: str, ax: plt.Axes | None = None,
+                                   save_path: str | None = None):
     """
     Grafica el rendimiento del portafolio para un único periodo.
 
     Args:
         portfolio_values (pd.Series): Serie del valor del portafolio.
         title (str): El título para el gráfico.
+        ax (plt.Axes | None): Ejes donde dibujar (ej. un panel de una figura
+                              compartida); quien los pasa se encarga de mostrar
+                              la figura. Si es `None`, se crea y muestra una nueva.
+        save_path (str | None): Archivo donde guardar la figura en lugar de mostrarla.
     """
-    plt.figure()
-    portfolio_values.plot(title=title)
-    plt.xlabel('Fecha')
-    plt.ylabel('Valor del Portafolio (USD)')
-    plt.show()
+    plt = pyplot()
+    own_figure = ax is None
+    if own_figure:
+        _, ax = plt.subplots()
+    _downsample(portfolio_values).plot(ax=ax, title=title)
+    ax.set_xlabel('Fecha')
+    ax.set_ylabel('Valor del Portafolio (USD)')
+    _finish(ax, own_figure, save_path)
 
 
-def plot_performance_vs_buy_and_hold(strategy_portfolio: pd.Series, price_data: pd.Series, initial_cash: float):
+def plot_performance_vs_buy_and_hold(strategy_portfolio: pd.Series, buy_and_hold_portfolio: pd.Series,
+                                     ax: plt.Axes | None = None,
+                                     save_path: str | None = None):
     """
     Grafica el rendimiento de la estrategia optimizada contra la estrategia
     pasiva de Comprar y Mantener (Buy and Hold).
 
     Args:
         strategy_portfolio (pd.Series): Serie del valor del portafolio de la estrategia.
-        price_data (pd.Series): Serie de precios de cierre del activo para el mismo periodo.
-        initial_cash (float): Capital inicial del periodo para calcular la base del Buy and Hold.
+        buy_and_hold_portfolio (pd.Series): Serie del valor del portafolio de Comprar y
+                                            Mantener para el mismo periodo (calculada
+                                            una sola vez por quien llama).
+        ax (plt.Axes | None): Ejes donde dibujar. Si es `None`, se crea y muestra
+                              una figura nueva.
+        save_path (str | None): Archivo donde guardar la figura en lugar de mostrarla.
     """
-    buy_and_hold_shares = initial_cash / price_data.iloc[0]
-    buy_and_hold_portfolio = buy_and_hold_shares * price_data
+    plt = pyplot()
+    own_figure = ax is None
+    if own_figure:
+        _, ax = plt.subplots()
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+    import matplotlib.dates as mdates
 
-    plt.figure()
-    strategy_portfolio.plot(label='Estrategia Optimizada')
-    buy_and_hold_portfolio.plot(label='Comprar y Mantener (Buy and Hold)', color='gray', linestyle='--')
-    plt.title('Estrategia Optimizada vs. Comprar y Mantener (Test + Validation)')
-    plt.xlabel('Fecha')
-    plt.ylabel('Valor del Portafolio (USD)')
-    plt.legend()
-    plt.show()
+    # Ambas curvas se dibujan como un solo `LineCollection` (un artista en lugar
+    # de dos `Line2D`); el eje X usa las fechas en el formato de matplotlib.
+    colors = [plt.rcParams['axes.prop_cycle'].by_key()['color'][0], 'gray']
+    linestyles = ['-', '--']
+    labels = ['Estrategia Optimizada', 'Comprar y Mantener (Buy and Hold)']
+    segments = [np.column_stack([mdates.date2num(series.index), series.to_numpy(dtype=np.float64)])
+                for series in (_downsample(strategy_portfolio), _downsample(buy_and_hold_portfolio))]
+    ax.add_collection(LineCollection(segments, colors=colors, linestyles=linestyles))
+    ax.autoscale_view()
+    ax.xaxis_date()
+    ax.set_title('Estrategia Optimizada vs. Comprar y Mantener (Test + Validation)')
+    ax.set_xlabel('Fecha')
+    ax.set_ylabel('Valor del Portafolio (USD)')
+    ax.legend([Line2D([], [], color=color, linestyle=style) for color, style in zip(colors, linestyles)],
+              labels)
+    _finish(ax, own_figure, save_path)
 
 
-def plot_split_performance(test_portfolio: pd.Series, validation_portfolio: pd.Series):
+def plot_split_performance(test_portfolio: pd.Series, validation_portfolio: pd.Series,
+                           ax: plt.Axes | None = None,
+                           save_path: str | None = None):
     """
     Grafica el rendimiento del portafolio en los periodos de Test y Validation
     en un mismo gráfico para visualizar la continuidad.
@@ -57,13 +163,18 @@ def plot_split_performance(test_portfolio: pd.Series, validation_portfolio: pd.S
     Args:
         test_portfolio (pd.Series): Serie del valor del portafolio en el set de prueba.
         validation_portfolio (pd.Series): Serie del valor del portafolio en el set de validación.
+        ax (plt.Axes | None): Ejes donde dibujar. Si es `None`, se crea y muestra
+                              una figura nueva.
+        save_path (str | None): Archivo donde guardar la figura en lugar de mostrarla.
     """
-    plt.figure()
-    test_portfolio.plot(label='Test')
-    validation_portfolio.plot(label='Validation')
-    plt.title('Rendimiento del Portafolio (Test + Validation)')
-    plt.xlabel('Fecha')
-    plt.ylabel('Valor del Portafolio (USD)')
-    plt.legend()
-    plt.show()
-
+    plt = pyplot()
+    own_figure = ax is None
+    if own_figure:
+        _, ax = plt.subplots()
+    _downsample(test_portfolio).plot(ax=ax, label='Test')
+    _downsample(validation_portfolio).plot(ax=ax, label='Validation')
+    ax.set_title('Rendimiento del Portafolio (Test + Validation)')
+    ax.set_xlabel('Fecha')
+    ax.set_ylabel('Valor del Portafolio (USD)')
+    ax.legend()
+    _finish(ax, own_figure, save_path)
@@ -0,0 +1,53 @@
+import time
+import numpy as np
+import pandas as pd
+from get_signals import calculate_indicators, generate_signals
+from backtesting import run_backtest, run_backtest_splits
+from metrics import calculate_calmar_for_optimization, calculate_full_performance_metrics
+
+# Parámetros de ejemplo: solo determinan los tipos con que se compilan los kernels.
+_PARAMS = {
+    'rsi_window': 14, 'rsi_lower': 30, 'rsi_upper': 70, 'bb_window': 20, 'stoch_window': 14,
+    'stoch_buy_th': 20, 'stoch_sell_th': 80, 'macd_short_window': 12, 'macd_long_window': 100,
+    'macd_signal_window': 9, 'stop_loss': 0.03, 'take_profit': 0.05, 'pct_cash': 0.05,
+    'max_short_pct': 0.3
+}
+
+
+def precompile(n_bars: int = 1_000) -> float:
+    """
+    Compila todos los kernels de Numba ejecutando el flujo completo sobre datos
+    sintéticos. Como los kernels usan `cache=True`, el código compilado queda
+    guardado en disco y las siguientes ejecuciones (incluidos los procesos de
+    la optimización en paralelo) arrancan sin el tiempo de compilación.
+
+    Args:
+        n_bars (int): Número de velas sintéticas a generar.
+
+    Returns:
+        float: Segundos empleados (compilación o carga desde la caché).
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(0)
+    # Precios en float32, como los entrega `utils.load_and_split_data`.
+    close = (30_000 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))).astype(np.float32)
+    df = pd.DataFrame(
+        {'Open': close, 'High': close * 1.005, 'Low': close * 0.995, 'Close': close},
+        index=pd.date_range('2020-01-01', periods=n_bars, freq='h', name='Date')
+    )
+
+    # Mismas llamadas que hacen `main` y `optimize.objective`.
+    _, portfolio, trades_log, _ = run_backtest(df, 1_000_000, 0.00125, _PARAMS)
+    calculate_full_performance_metrics(portfolio, trades_log, 60)
+    signals = generate_signals(calculate_indicators(df, _PARAMS, trim_warmup=False), _PARAMS)
+    half = n_bars // 2
+    for parallel in (True, False):
+        for portfolio, _ in run_backtest_splits([df.iloc[:half], df.iloc[half:]], 1_000_000, 0.00125,
+                                                _PARAMS, [signals.iloc[:half], signals.iloc[half:]],
+                                                parallel=parallel):
+            calculate_calmar_for_optimization(portfolio)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(f"Kernels listos en {precompile():.2f} s.")
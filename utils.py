@@ -1,44 +1,160 @@
+import json
+from pathlib import Path
+import numpy as np
 import pandas as pd
 from metrics import calculate_full_performance_metrics, generate_returns_table
 
+# pyarrow es opcional: sin él se lee el CSV con el motor C de pandas y no se
+# guarda la copia en parquet (que también lo necesita).
+try:
+    import pyarrow  # noqa: F401
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
 
-def load_and_split_data(file_path: str, train_ratio: float, test_ratio: float):
+# Versión del formato de la copia en parquet: se incrementa cada vez que cambia
+# cómo se construye el DataFrame al leer el CSV (tipos, fechas, orden), para que
+# las copias escritas por versiones anteriores se regeneren.
+# 2: precios en float32.
+_CACHE_FORMAT = 2
+
+
+def _read_cache_meta(meta_path: Path) -> dict | None:
+    """
+    Lee el archivo `.meta` de la copia en parquet.
+
+    Returns:
+        dict | None: Los datos del CSV con que se generó la copia, o `None` si el
+        archivo no existe o no se puede leer (la copia se regenera).
+    """
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def load_and_split_data(file_path: str, train_ratio: float, test_ratio: float,
+                        columns: list[str] | None = None, cutoffs: list | None = None):
     """
     Carga datos desde un archivo CSV, procesa la columna de fecha y los divide
-    en sets de entrenamiento, prueba y validación.
+    en sets de entrenamiento, prueba y validación. El resultado procesado se
+    guarda junto al CSV en formato parquet y se reutiliza en las siguientes
+    cargas mientras el CSV no se modifique.
 
     Args:
         file_path (str): Ruta al archivo CSV de datos históricos.
         train_ratio (float): Proporción de datos para el set de entrenamiento (ej. 0.6).
         test_ratio (float): Proporción de datos para el set de prueba (ej. 0.2).
+        columns (list[str] | None): Columnas de precios a cargar además de 'Date'.
+                                    Si es `None`, se cargan 'Open', 'High', 'Low' y 'Close'.
+        cutoffs (list | None): Fechas de inicio de los sets de prueba y de validación
+                               (ej. `['2023-01-01', '2024-06-01']`). Si se indican,
+                               reemplazan a `train_ratio` y `test_ratio`.
 
     Returns:
-        tuple[pd.DataFrame | None, ...]: Una tupla con los DataFrames de
-        entrenamiento, prueba y validación. Retorna (None, None, None) si el
-        archivo no se encuentra.
+        tuple: Una tupla con los DataFrames de entrenamiento, prueba y validación,
+        y un diccionario con los arreglos de NumPy de cada set (sin copia):
+        `'<set>_close'` (precios de cierre) y `'<set>_timestamps'` (fechas), con
+        `<set>` en 'train', 'test' y 'validation'. Retorna (None, None, None, None)
+        si el archivo no se encuentra.
+
+    Raises:
+        ValueError: Si `cutoffs` no tiene exactamente dos fechas o si la primera
+                    es posterior a la segunda.
     """
+    # Se validan antes de leer el CSV: un error en las fechas no debe esperar a la carga.
+    if cutoffs is not None:
+        if len(cutoffs) != 2:
+            raise ValueError(f"`cutoffs` debe tener dos fechas (inicio de prueba y de validación); "
+                             f"se recibieron {len(cutoffs)}.")
+        cutoffs = pd.to_datetime(cutoffs)
+        if cutoffs[0] > cutoffs[1]:
+            raise ValueError(f"El inicio del set de prueba ({cutoffs[0]}) es posterior al del set "
+                             f"de validación ({cutoffs[1]}).")
+
+    # Copia en parquet del CSV ya procesado: evita volver a parsearlo en cada
+    # ejecución. Solo se usa si el CSV no cambió desde que se generó (misma fecha
+    # de modificación y tamaño, guardados en un archivo `.meta` junto a la copia).
+    # La extensión se añade (`datos.csv.parquet`) en lugar de reemplazarse: así no
+    # se pisa un `datos.parquet` existente ni comparten copia `datos.csv` y `datos.txt`.
+    csv_path = Path(file_path)
+    cache_path = csv_path.with_name(csv_path.name + '.parquet')
+    meta_path = cache_path.with_name(cache_path.name + '.meta')
     try:
-        data = pd.read_csv(file_path, skiprows=1)
+        csv_stat = csv_path.stat()
     except FileNotFoundError:
         print(f"Error: No se encontró el archivo '{file_path}'.")
-        return None, None, None
-
-    data['Date'] = pd.to_datetime(data['Date'], format='mixed')
-    data = data.set_index('Date').sort_index()
-
-    train_size = int(len(data) * train_ratio)
-    test_size = int(len(data) * test_ratio)
-
-    train_df = data.iloc[:train_size]
-    test_df = data.iloc[train_size: train_size + test_size]
-    validation_df = data.iloc[train_size + test_size:]
+        return None, None, None, None
+    if columns is None:
+        columns = ['Open', 'High', 'Low', 'Close']
+    # Las columnas y el formato forman parte de la validación: una copia con otras
+    # columnas o escrita por otra versión del cargador se regenera.
+    source = {'mtime_ns': csv_stat.st_mtime_ns, 'size': csv_stat.st_size, 'columns': list(columns),
+              'format': _CACHE_FORMAT}
+
+    if _HAS_PYARROW and cache_path.exists() and _read_cache_meta(meta_path) == source:
+        data = pd.read_parquet(cache_path)
+    else:
+        # El motor de pyarrow no admite `skiprows` antes del encabezado: la
+        # primera línea (la fuente de los datos) se salta con `header=1`. Las
+        # fechas se convierten al leer, en el parser en C de pyarrow. Los precios
+        # se leen directamente como float32: 7 cifras significativas bastan y los
+        # indicadores recorren la mitad de memoria (sin un arreglo float64 intermedio).
+        data = pd.read_csv(csv_path, header=1, usecols=['Date', *columns],
+                           dtype={column: 'float32' for column in columns},
+                           parse_dates=['Date'], engine='pyarrow' if _HAS_PYARROW else 'c')
+        if not pd.api.types.is_datetime64_any_dtype(data['Date']):
+            # Las fechas son ISO 8601 (algunas con milisegundos); el formato
+            # 'mixed', que infiere fila por fila, queda solo como respaldo.
+            try:
+                data['Date'] = pd.to_datetime(data['Date'], format='ISO8601')
+            except ValueError:
+                data['Date'] = pd.to_datetime(data['Date'], format='mixed')
+        # `inplace=True`: se reemplaza el índice sin copiar todas las columnas.
+        data.set_index('Date', inplace=True)
+        # Solo se ordena si hace falta. Los CSV de Binance vienen del más reciente
+        # al más antiguo: basta invertirlos (la copia deja los arreglos contiguos).
+        if not data.index.is_monotonic_increasing:
+            if data.index.is_monotonic_decreasing:
+                data = data.iloc[::-1].copy()
+            else:
+                data.sort_index(inplace=True)
+        if _HAS_PYARROW:
+            # La copia es opcional: si no se puede escribir (carpeta de solo
+            # lectura, disco lleno) se sigue con los datos recién leídos. El
+            # `.meta` se borra antes y se escribe solo si el parquet se guardó
+            # completo, así que nunca se da por válida una copia a medias.
+            try:
+                meta_path.unlink(missing_ok=True)
+                data.to_parquet(cache_path)
+                meta_path.write_text(json.dumps(source))
+            except OSError as e:
+                print(f"Aviso: no se pudo guardar la copia en parquet ({e}).")
+
+    if cutoffs is not None:
+        # Las fechas se convierten en posiciones con una sola búsqueda binaria
+        # sobre el índice ordenado (`get_indexer` no admite las fechas repetidas
+        # del CSV) y se corta por posición, sin `loc` por fecha.
+        test_start, validation_start = data.index.searchsorted(cutoffs)
+    else:
+        test_start = int(len(data) * train_ratio)
+        validation_start = test_start + int(len(data) * test_ratio)
+
+    train_df = data.iloc[:test_start]
+    test_df = data.iloc[test_start:validation_start]
+    validation_df = data.iloc[validation_start:]
+
+    arrays = {}
+    for name, split_df in (('train', train_df), ('test', test_df), ('validation', validation_df)):
+        arrays[f'{name}_close'] = split_df['Close'].to_numpy(copy=False)
+        arrays[f'{name}_timestamps'] = split_df.index.to_numpy(copy=False)
 
     print(f"Datos cargados: {len(data)} velas en total.")
-    return train_df, test_df, validation_df
+    return train_df, test_df, validation_df, arrays
 
 
 def display_final_results(dataset_name: str, initial_cash: float, portfolio: pd.Series,
-                          log: list, best_params: dict):
+                          log: np.ndarray, best_params: dict):
     """
     Imprime un reporte formateado con los resultados del backtest para un set de datos.
 
@@ -49,45 +165,45 @@ def display_final_results(dataset_name: str, initial_cash: float, portfolio: pd.
         dataset_name (str): Nombre del set de datos (ej. "Train") para el título del reporte.
         initial_cash (float): Capital inicial del periodo evaluado.
         portfolio (pd.Series): Serie temporal del valor del portafolio para el periodo.
-        log (list): Lista de objetos `Operation` cerrados durante el periodo.
+        log (np.ndarray): Operaciones cerradas durante el periodo (`TRADE_DTYPE`).
         best_params (dict): Diccionario con los hiperparámetros óptimos utilizados
                             en la simulación.
     """
     final_metrics = calculate_full_performance_metrics(portfolio, log, 60)
 
-    print(f"\n--- Métricas con Parámetros Óptimos ({dataset_name}) ---")
+    # El reporte se arma como una lista de líneas y se imprime de una sola vez.
+    lines = [f"\n--- Métricas con Parámetros Óptimos ({dataset_name}) ---"]
 
     # Imprimir los hiperparámetros solo en el primer reporte (Train)
     if dataset_name == "Train":
-        print("\nMejores Hiperparámetros Utilizados:")
-        for key, value in best_params.items():
-            if isinstance(value, float):
-                print(f"  - {key}: {value:.4f}")
-            else:
-                print(f"  - {key}: {value}")
-        print("-" * 50)
+        lines.append("\nMejores Hiperparámetros Utilizados:")
+        lines += [f"  - {key}: {value:.4f}" if isinstance(value, float) else f"  - {key}: {value}"
+                  for key, value in best_params.items()]
+        lines.append("-" * 50)
 
     # Imprimir los resultados del portafolio
     final_value = portfolio.iloc[-1]
     net_return = (final_value - initial_cash) / initial_cash
 
-    print(f"- Valor Inicial del Periodo:     ${initial_cash:,.2f} USD")
-    print(f"- Valor Final del Portafolio:   ${final_value:,.2f} USD")
-    print(f"- Rendimiento Neto del Periodo: {net_return:.2%}")
-    print("-" * 50)
+    lines += [
+        f"- Valor Inicial del Periodo:     ${initial_cash:,.2f} USD",
+        f"- Valor Final del Portafolio:   ${final_value:,.2f} USD",
+        f"- Rendimiento Neto del Periodo: {net_return:.2%}",
+        "-" * 50,
+    ]
 
     # Imprimir el resto de las métricas
-    for key, value in final_metrics.items():
-        print(f"- {key}: {value}")
+    lines += [f"- {key}: {value}" for key, value in final_metrics.items()]
 
     # Imprimir la tabla de rendimientos periódicos
     if not portfolio.empty:
         returns_tables = generate_returns_table(portfolio)
-        print("\n--- Rendimientos Periódicos ---")
+        lines.append("\n--- Rendimientos Periódicos ---")
         for period_name, returns_series in returns_tables.items():
             if not returns_series.empty:
-                print(f"\n{period_name}:")
+                lines.append(f"\n{period_name}:")
                 # Formatear la serie para mostrarla como tabla
                 formatted_series = returns_series.map('{:.2%}'.format)
-                print(formatted_series.to_string())
+                lines.append(formatted_series.to_string())
 
+    print("\n".join(lines))